@@ -0,0 +1,120 @@
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, Sequence
+from objects import CelestialObject, BlackHole
+
+# Dtype of the per-body masses and sizes. Positions and velocities stay
+# float64: coordinates reach 1e8 in either direction, where float32 values
+# are about 8 units apart, coarser than the single-digit sizes of asteroids
+PROPERTY_DTYPE = np.float32
+
+@dataclass
+class Bodies:
+    """Struct-of-arrays state of every body in a universe.
+
+    Column i of the (2, N) arrays and entry i of the (N,) arrays all belong
+    to the same body, which is entry i of the objects the arrays were
+    gathered from. ``moved`` marks the bodies that have
+    moved since collisions were last tested. Removed bodies stay in the
+    arrays, cleared in ``alive``, until the arrays are compacted with
+    ``select(alive)``.
+    """
+
+    pos: np.ndarray
+    vel: np.ndarray
+    force: np.ndarray
+    mass: np.ndarray
+    inv_mass: np.ndarray
+    size: np.ndarray
+    min_radius: np.ndarray
+    type_id: np.ndarray
+    moved: np.ndarray = None
+    alive: np.ndarray = None
+    indices_by_type: Dict[int, np.ndarray] = field(init=False)
+
+    def __post_init__(self):
+        # Every body needs a collision test until it is known to be at rest
+        if self.moved is None:
+            self.moved = np.ones(len(self), dtype=bool)
+        if self.alive is None:
+            self.alive = np.ones(len(self), dtype=bool)
+        self.indices_by_type = {type_id: np.flatnonzero(self.type_id == type_id)
+                                for type_id in np.unique(self.type_id).tolist()}
+
+    def get_indices(self, type_id: int) -> np.ndarray:
+        """Get the indices of every body of a type."""
+        return self.indices_by_type.get(type_id, np.zeros(0, dtype=np.intp))
+
+    @classmethod
+    def empty(cls, count: int = 0) -> 'Bodies':
+        """Allocate zeroed arrays for a number of bodies."""
+        return cls(pos=np.zeros((2, count)), vel=np.zeros((2, count)), force=np.zeros((2, count)),
+                   mass=np.zeros(count, dtype=PROPERTY_DTYPE), inv_mass=np.zeros(count, dtype=PROPERTY_DTYPE),
+                   size=np.zeros(count, dtype=PROPERTY_DTYPE),
+                   min_radius=np.zeros(count, dtype=int), type_id=np.zeros(count, dtype=np.int8))
+
+    @classmethod
+    def from_objects(cls, objects: Sequence[CelestialObject]) -> 'Bodies':
+        """Gather the state of objects into newly allocated arrays.
+
+        Each object's position, velocity and force become views of its
+        column of the new arrays.
+        """
+        objects = list(objects)
+        count = len(objects)
+        mass = np.array([obj.mass for obj in objects], dtype=PROPERTY_DTYPE)
+        type_id = np.array([obj.TYPE_ID for obj in objects], dtype=np.int8)
+
+        # Black holes and massless objects are not accelerated by gravity
+        movable = (mass > 0) & (type_id != BlackHole.TYPE_ID)
+        inv_mass = np.divide(1.0, mass, out=np.zeros(count, dtype=PROPERTY_DTYPE), where=movable)
+
+        bodies = cls(pos=np.zeros((2, count)), vel=np.zeros((2, count)), force=np.zeros((2, count)),
+                     mass=mass, inv_mass=inv_mass, size=np.array([obj.size for obj in objects], dtype=PROPERTY_DTYPE),
+                     min_radius=np.array([obj.MIN_RADIUS for obj in objects], dtype=int), type_id=type_id)
+        bodies.bind(objects)
+        return bodies
+
+    def __len__(self) -> int:
+        return len(self.mass)
+
+    @property
+    def pos_x(self) -> np.ndarray:
+        """X coordinates of every body."""
+        return self.pos[0]
+
+    @property
+    def pos_y(self) -> np.ndarray:
+        """Y coordinates of every body."""
+        return self.pos[1]
+
+    @property
+    def vel_x(self) -> np.ndarray:
+        """X velocities of every body."""
+        return self.vel[0]
+
+    @property
+    def vel_y(self) -> np.ndarray:
+        """Y velocities of every body."""
+        return self.vel[1]
+
+    def bind(self, objects: Sequence[CelestialObject]):
+        """Copy each object's position, velocity and force into its column and make them views of it."""
+        for i, obj in enumerate(objects):
+            obj.bind(self.pos[:, i], self.vel[:, i], self.force[:, i])
+
+    def select(self, keep: np.ndarray) -> 'Bodies':
+        """Get new arrays holding the bodies picked by ``keep``, a boolean mask or an index array, in that order."""
+        return Bodies(pos=self.pos[:, keep], vel=self.vel[:, keep], force=self.force[:, keep],
+                      mass=self.mass[keep], inv_mass=self.inv_mass[keep], size=self.size[keep],
+                      min_radius=self.min_radius[keep], type_id=self.type_id[keep],
+                      moved=self.moved[keep], alive=self.alive[keep])
+
+    def remove(self, indices):
+        """Mark bodies as removed, leaving them in place as massless, motionless bodies that never collide."""
+        self.alive[indices] = False
+        self.moved[indices] = False
+        self.mass[indices] = 0.0
+        self.inv_mass[indices] = 0.0
+        self.size[indices] = -np.inf
+        self.vel[:, indices] = 0.0
@@ -0,0 +1,69 @@
+import math
+import numpy as np
+from numba import cuda, float64
+
+# Threads per block, and bodies per tile of the block's shared memory
+TILE_SIZE = 128
+
+def cuda_available() -> bool:
+    """Whether a CUDA device can run the kernels in this module."""
+    return cuda.is_available()
+
+def compute_forces_cuda(pos_x, pos_y, mass, fx, fy, G, soft2, cut2):
+    """Compute the net gravitational force on every body by direct summation on the GPU.
+
+    Takes the same arguments as physics_kernels.compute_forces; the inputs
+    are copied to the device and the forces copied back into ``fx`` and ``fy``.
+    """
+    n = pos_x.shape[0]
+    if n == 0:
+        return
+    d_fx = cuda.device_array(n)
+    d_fy = cuda.device_array(n)
+    blocks = (n + TILE_SIZE - 1) // TILE_SIZE
+    _force_kernel[blocks, TILE_SIZE](cuda.to_device(np.ascontiguousarray(pos_x)),
+                                     cuda.to_device(np.ascontiguousarray(pos_y)),
+                                     cuda.to_device(np.ascontiguousarray(mass)), d_fx, d_fy, G, soft2, cut2)
+    fx[:] = d_fx.copy_to_host()
+    fy[:] = d_fy.copy_to_host()
+
+@cuda.jit(fastmath=True)
+def _force_kernel(pos_x, pos_y, mass, fx, fy, G, soft2, cut2):
+    """One thread per body; each block stages tiles of bodies in shared memory and sums over them.
+
+    Every thread of a block loads one body of the tile, so threads past the
+    last body still take part, loading massless padding.
+    """
+    tile = cuda.shared.array((3, TILE_SIZE), float64)
+    n = pos_x.shape[0]
+    i = cuda.grid(1)
+    x = pos_x[i] if i < n else 0.0
+    y = pos_y[i] if i < n else 0.0
+    ax = 0.0
+    ay = 0.0
+    for base in range(0, n, TILE_SIZE):
+        j = base + cuda.threadIdx.x
+        if j < n:
+            tile[0, cuda.threadIdx.x] = pos_x[j]
+            tile[1, cuda.threadIdx.x] = pos_y[j]
+            tile[2, cuda.threadIdx.x] = mass[j]
+        else:
+            tile[0, cuda.threadIdx.x] = 0.0
+            tile[1, cuda.threadIdx.x] = 0.0
+            tile[2, cuda.threadIdx.x] = 0.0
+        cuda.syncthreads()
+
+        # A body's own term vanishes because its separation is zero
+        for k in range(TILE_SIZE):
+            dx = tile[0, k] - x
+            dy = tile[1, k] - y
+            r2 = dx * dx + dy * dy + soft2
+            if r2 <= cut2:
+                f = tile[2, k] / (r2 * math.sqrt(r2))
+                ax += f * dx
+                ay += f * dy
+        cuda.syncthreads()
+
+    if i < n:
+        fx[i] = G * mass[i] * ax
+        fy[i] = G * mass[i] * ay
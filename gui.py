@@ -1,7 +1,11 @@
 import pygame
 import math
-from typing import Tuple, Optional
-from utils import COLORS, world_to_screen, screen_to_world, draw_text, clamp
+from collections import OrderedDict
+import numpy as np
+from typing import List, Tuple, Optional
+from objects import circle_sprite
+from render_utils import COLORS, world_to_screen, world_to_screen_batch, screen_to_world, quantize_radii
+from math_utils import clamp
 
 class GUI:
     """Graphical user interface for the universe simulation."""
@@ -9,6 +13,28 @@ class GUI:
     DEFAULT_ZOOM = 1e-5
     MIN_ZOOM = 1e-7
     MAX_ZOOM = 1e2
+
+    # Frame rate cap for rendering and simulation
+    MAX_FPS = 60
+
+    # Number of rendered text surfaces kept for reuse between frames
+    TEXT_CACHE_SIZE = 256
+
+    CONTROLS = [
+        "Controls:",
+        "Left Click: View Object Stats",
+        "Right Drag: Move Camera",
+        "Wheel: Zoom",
+        "Space: Pause/Resume",
+        "R: Reset Universe",
+        "V: Reset View",
+        "G: Toggle Grid",
+        "T: Toggle Trails",
+        "I: Toggle Object Stats",
+        "1: Decrease Time Step",
+        "2: Increase Time Step",
+        "ESC: Quit"
+    ]
     
     def __init__(self, screen_size: Tuple[int, int] = (1800, 1024)):
         pygame.init()
@@ -26,6 +52,11 @@ class GUI:
         self.font_small = pygame.font.Font(None, 24)
         self.font_large = pygame.font.Font(None, 36)
         self.font_title = pygame.font.Font(None, 48)
+
+        # Text that never changes is rendered once; other text is cached by content
+        self._text_cache = OrderedDict()
+        self._title_surface = self.font_title.render("Universe Simulation", True, COLORS['text'])
+        self._controls_surface = self._render_controls()
         
         # Interaction settings
         self.dragging = False
@@ -38,6 +69,12 @@ class GUI:
         
         # Performance settings
         self.max_visible_objects = 1000
+
+        # Screen areas drawn in the previous frame, and whether the next frame
+        # has to repaint the whole screen rather than just those areas
+        self._last_rects = []
+        self._full_redraw = True
+        self._clock = pygame.time.Clock()
         
     def handle_events(self, universe):
         """Handle pygame events."""
@@ -45,7 +82,12 @@ class GUI:
             if event.type == pygame.QUIT:
                 return False, False
             
+            elif event.type == pygame.VIDEOEXPOSE:
+                self._full_redraw = True
+
             elif event.type == pygame.KEYDOWN:
+                # Any key may change the view, so repaint everything
+                self._full_redraw = True
                 if event.key == pygame.K_ESCAPE:
                     return False, False
                 elif event.key == pygame.K_SPACE:
@@ -94,6 +136,7 @@ class GUI:
         
         # Select object if it's close enough (within 50 pixels on screen)
         screen_distance = distance * self.zoom
+        self._full_redraw = True
         if nearest_obj and screen_distance < 50:
             self.selected_object = nearest_obj
             self.show_info = True
@@ -118,15 +161,18 @@ class GUI:
             
             # Update drag start position
             self.drag_start = pos
+            self._full_redraw = True
     
     def reset_view(self):
         """Reset camera to default view."""
         self.camera_pos = [0.0, 0.0]
         self.zoom = self.DEFAULT_ZOOM
+        self._full_redraw = True
     
     def zoom_in(self, center_pos: Tuple[int, int]):
         """Zoom in towards the mouse position."""
         old_zoom = self.zoom
+        self._full_redraw = True
         self.zoom = clamp(self.zoom * 1.2, self.min_zoom, self.max_zoom)
         
         # Adjust camera to keep zoom centered on mouse
@@ -139,6 +185,7 @@ class GUI:
     def zoom_out(self, center_pos: Tuple[int, int]):
         """Zoom out from the mouse position."""
         old_zoom = self.zoom
+        self._full_redraw = True
         self.zoom = clamp(self.zoom / 1.2, self.min_zoom, self.max_zoom)
         
         # Adjust camera to keep zoom centered on mouse
@@ -149,6 +196,33 @@ class GUI:
         self.camera_pos[0] += new_world_center[0] - world_center[0]
         self.camera_pos[1] += new_world_center[1] - world_center[1]
     
+    def _render_controls(self) -> pygame.Surface:
+        """Render the list of controls onto a single transparent surface."""
+        lines = [self.font_small.render(control, True, COLORS['text'] if i == 0 else (200, 200, 200))
+                 for i, control in enumerate(self.CONTROLS)]
+        width = max(line.get_width() for line in lines)
+        height = 20 * (len(lines) - 1) + lines[-1].get_height()
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for i, line in enumerate(lines):
+            # Taking the maximum against the transparent surface copies the
+            # pixels of each line unchanged instead of blending them
+            surface.blit(line, (0, i * 20), special_flags=pygame.BLEND_RGBA_MAX)
+        return surface
+
+    def draw_cached_text(self, text: str, font: pygame.font.Font, color: Tuple[int, int, int],
+                         pos: Tuple[int, int]) -> pygame.Rect:
+        """Draw text, reusing the surface rendered for the same text, and return the area it covers."""
+        key = (text, id(font), color)
+        text_surface = self._text_cache.get(key)
+        if text_surface is None:
+            text_surface = font.render(text, True, color)
+            self._text_cache[key] = text_surface
+            if len(self._text_cache) > self.TEXT_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+        else:
+            self._text_cache.move_to_end(key)
+        return self.screen.blit(text_surface, pos)
+
     def draw_grid(self):
         """Draw a grid on the screen."""
         if not self.show_grid:
@@ -165,100 +239,116 @@ class GUI:
         for y in range(0, self.screen_size[1], grid_spacing):
             pygame.draw.line(self.screen, COLORS['grid'], (0, y), (self.screen_size[0], y), 1)
     
-    def draw_objects(self, universe):
-        """Draw all visible objects."""
-        # Sort objects by distance from camera (for proper layering)
-        visible_objects = []
-        total_objects = len(universe.objects.values())
-        
-        for obj in universe.objects.values():
-            screen_pos = world_to_screen(obj.position, self.camera_pos, self.zoom, self.screen_size)
-            
-            # Check if visible
-            if (0 <= screen_pos[0] <= self.screen_size[0] and 0 <= screen_pos[1] <= self.screen_size[1]):
-                visible_objects.append(obj)
+    def draw_objects(self, universe) -> List[pygame.Rect]:
+        """Draw all visible objects and return the screen areas drawn to."""
+        total_objects = len(universe.objects)
+
+        # Only objects inside the visible area of the world are transformed to the screen
+        half_width = self.screen_size[0] / (2 * self.zoom)
+        half_height = self.screen_size[1] / (2 * self.zoom)
+        visible_indices = universe.spatial_index.query(self.camera_pos[0] - half_width, self.camera_pos[1] - half_height,
+                                                       self.camera_pos[0] + half_width, self.camera_pos[1] + half_height)
+        visible_indices = visible_indices[universe.get_alive()[visible_indices]]
        
         # Limit number of visible objects for performance
-        if len(visible_objects) > self.max_visible_objects:
-            visible_objects = visible_objects[:self.max_visible_objects]
-        
-        # Draw objects
-        for obj in visible_objects:
+        visible_indices = visible_indices[:self.max_visible_objects]
+        visible_objects = [universe.object_list[i] for i in visible_indices]
+
+        screen_positions = world_to_screen_batch(universe.get_positions()[:, visible_indices].T,
+                                                 self.camera_pos, self.zoom, self.screen_size)
+
+        # Plain circles drawn without trails have a minimum radius of 2 pixels
+        min_radii = universe.get_min_radii()[visible_indices] if self.show_trails else 2
+        radii = quantize_radii(np.maximum(min_radii, (universe.get_sizes()[visible_indices] * self.zoom).astype(int)))
+
+        dirty_rects = []
+
+        # Draw trails underneath all objects
+        if self.show_trails:
+            trail_objects = [obj for obj in visible_objects if obj.SHOW_TRAIL and obj.trail_count > 1]
+            if trail_objects:
+                # Transform the points of every trail in one batch, then split them per object
+                trails = [obj.get_trail() for obj in trail_objects]
+                points = world_to_screen_batch(np.concatenate(trails), self.camera_pos, self.zoom, self.screen_size)
+                ends = np.cumsum([len(trail) for trail in trails])
+                for obj, trail_points in zip(trail_objects, np.split(points, ends[:-1])):
+                    dirty_rects.append(pygame.draw.lines(self.screen, obj.color, False, trail_points.tolist(), 1))
+
+        # Draw objects from their cached sprites with a single batched blit
+        sprite_blits = []
+        for obj, screen_pos, radius in zip(visible_objects, screen_positions.tolist(), radii.tolist()):
             if self.show_trails:
-                obj.draw(self.screen, self.camera_pos, self.zoom, self.screen_size)
+                sprite = obj.get_sprite(radius)
             else:
                 # Draw without trails
-                screen_pos = world_to_screen(obj.position, self.camera_pos, self.zoom, self.screen_size)
-                radius = max(2, int(obj.size * self.zoom))  # Minimum radius of 2 pixels
-                pygame.draw.circle(self.screen, obj.color, screen_pos, radius)
+                sprite = circle_sprite(obj.color, radius)
+
+            if sprite is not None:
+                extent = sprite.get_width() // 2
+                sprite_blits.append((sprite, (screen_pos[0] - extent, screen_pos[1] - extent)))
+            elif self.show_trails:
+                # Too large to cache, draw it directly
+                obj.render(self.screen, screen_pos, radius)
+                extent = obj.sprite_extent(radius)
+                dirty_rects.append(pygame.Rect(screen_pos[0] - extent, screen_pos[1] - extent, 2 * extent + 1, 2 * extent + 1))
+            else:
+                dirty_rects.append(pygame.draw.circle(self.screen, obj.color, screen_pos, radius))
+
+        dirty_rects.extend(self.screen.blits(sprite_blits))
         
         # Highlight selected object
         if self.selected_object:
             screen_pos = world_to_screen(self.selected_object.position, self.camera_pos, self.zoom, self.screen_size)
             radius = max(3, int(self.selected_object.size * self.zoom) + 2)
-            pygame.draw.circle(self.screen, (255, 255, 255), screen_pos, radius, 2)
+            dirty_rects.append(pygame.draw.circle(self.screen, (255, 255, 255), screen_pos, radius, 2))
         
         # Debug info
         debug_text = f"Total objects: {total_objects}, Visible: {len(visible_objects)}"
-        draw_text(self.screen, debug_text, self.font_small, (255, 255, 0), (10, self.screen_size[1] - 30))
+        dirty_rects.append(self.draw_cached_text(debug_text, self.font_small, (255, 255, 0), (10, self.screen_size[1] - 30)))
+
+        return dirty_rects
     
-    def draw_ui(self, universe, paused: bool):
-        """Draw user interface elements."""
+    def draw_ui(self, universe, paused: bool) -> List[pygame.Rect]:
+        """Draw user interface elements and return the screen areas drawn to."""
+        dirty_rects = []
+
         # Draw title
-        title_text = "Universe Simulation"
-        draw_text(self.screen, title_text, self.font_title, COLORS['text'], (10, 10))
+        dirty_rects.append(self.screen.blit(self._title_surface, (10, 10)))
         
         # Draw statistics
         stats = universe.get_statistics()
         y_offset = 60
         for key, value in stats.items():
             text = f"{key.replace('_', ' ').title()}: {value}"
-            draw_text(self.screen, text, self.font_small, COLORS['text'], (10, y_offset))
+            dirty_rects.append(self.draw_cached_text(text, self.font_small, COLORS['text'], (10, y_offset)))
             y_offset += 25
         
         # Draw camera info
         camera_text = f"Camera: ({self.camera_pos[0]:.1f}, {self.camera_pos[1]:.1f})"
-        draw_text(self.screen, camera_text, self.font_small, COLORS['text'], (10, y_offset))
+        dirty_rects.append(self.draw_cached_text(camera_text, self.font_small, COLORS['text'], (10, y_offset)))
         y_offset += 25
         
         zoom_text = f"Zoom: {self.zoom:.7f}x"
-        draw_text(self.screen, zoom_text, self.font_small, COLORS['text'], (10, y_offset))
+        dirty_rects.append(self.draw_cached_text(zoom_text, self.font_small, COLORS['text'], (10, y_offset)))
         y_offset += 25
         
         # Draw pause indicator
         if paused:
             pause_text = "PAUSED"
-            draw_text(self.screen, pause_text, self.font_large, (255, 0, 0), (10, y_offset))
+            dirty_rects.append(self.draw_cached_text(pause_text, self.font_large, (255, 0, 0), (10, y_offset)))
             y_offset += 40
         
         # Draw controls
-        controls = [
-            "Controls:",
-            "Left Click: View Object Stats",
-            "Right Drag: Move Camera",
-            "Wheel: Zoom",
-            "Space: Pause/Resume",
-            "R: Reset Universe",
-            "V: Reset View",
-            "G: Toggle Grid",
-            "T: Toggle Trails",
-            "I: Toggle Object Stats",
-            "1: Decrease Time Step",
-            "2: Increase Time Step",
-            "ESC: Quit"
-        ]
-        
-        for i, control in enumerate(controls):
-            color = COLORS['text'] if i == 0 else (200, 200, 200)
-            draw_text(self.screen, control, self.font_small, color, 
-                     (self.screen_size[0] - 250, 10 + i * 20))
+        dirty_rects.append(self.screen.blit(self._controls_surface, (self.screen_size[0] - 250, 10)))
         
         # Draw selected object info
         if self.selected_object and self.show_info:
-            self.draw_object_info(universe)
+            dirty_rects.append(self.draw_object_info(universe))
+
+        return dirty_rects
     
-    def draw_object_info(self, universe):
-        """Draw detailed information about the selected object."""
+    def draw_object_info(self, universe) -> pygame.Rect:
+        """Draw detailed information about the selected object and return the panel area."""
         info = universe.get_object_info(self.selected_object)
         
         # Create info panel
@@ -274,33 +364,55 @@ class GUI:
         self.screen.blit(panel_surface, (panel_x, panel_y))
         
         # Draw panel border
-        pygame.draw.rect(self.screen, COLORS['text'], 
-                        (panel_x, panel_y, panel_width, panel_height), 2)
+        panel_rect = pygame.draw.rect(self.screen, COLORS['text'], 
+                                      (panel_x, panel_y, panel_width, panel_height), 2)
         
         # Draw object info
         y_offset = panel_y + 10
         for key, value in info.items():
             text = f"{key.replace('_', ' ').title()}: {value}"
-            draw_text(self.screen, text, self.font_small, COLORS['text'], 
-                     (panel_x + 10, y_offset))
+            self.draw_cached_text(text, self.font_small, COLORS['text'], (panel_x + 10, y_offset))
             y_offset += 20
+
+        return panel_rect
     
     def render(self, universe):
-        """Render the complete frame."""
+        """Render the complete frame.
+
+        Unless the view has changed, only the areas drawn in the previous frame
+        are cleared and only those and the newly drawn areas are sent to the display.
+        While paused with an unchanged view nothing is redrawn at all.
+        """
+        self._clock.tick(self.MAX_FPS)
+
+        if self.paused and not self._full_redraw:
+            pygame.display.update([])
+            return
+
         # Clear screen
-        self.screen.fill(COLORS['background'])
+        if self._full_redraw:
+            self.screen.fill(COLORS['background'])
+        else:
+            for rect in self._last_rects:
+                self.screen.fill(COLORS['background'], rect)
         
         # Draw grid
         self.draw_grid()
         
         # Draw objects
-        self.draw_objects(universe)
+        dirty_rects = self.draw_objects(universe)
         
         # Draw UI
-        self.draw_ui(universe, self.paused)
+        dirty_rects.extend(self.draw_ui(universe, self.paused))
         
         # Update display
-        pygame.display.flip()
+        if self._full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._last_rects + dirty_rects)
+
+        self._last_rects = dirty_rects
+        self._full_redraw = False
     
     def quit(self):
         """Clean up pygame."""
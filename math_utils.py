@@ -0,0 +1,3 @@
+def clamp(value: float, min_val: float, max_val: float) -> float:
+    """Clamp a value between min and max."""
+    return max(min_val, min(value, max_val))
@@ -1,91 +1,148 @@
-import random
+import numpy as np
 import pygame
-from typing import Tuple, List
-from utils import COLORS
+from typing import Tuple, Optional
+from render_utils import COLORS
+
+# Sprites wider than this are drawn directly instead of being cached
+MAX_CACHED_RADIUS = 256
+
+# Pre-rendered sprites keyed by (sprite key, quantized radius)
+_SPRITE_CACHE = {}
+
+# Trail of objects that never record one
+_NO_TRAIL = np.zeros((0, 2))
+_NO_TRAIL.flags.writeable = False
+
+def circle_sprite(color: Tuple[int, int, int], radius: int) -> Optional[pygame.Surface]:
+    """Get a cached sprite of a plain filled circle, or None if it is too large to cache.
+
+    The radius must already be quantized with quantize_radii.
+    """
+    if radius > MAX_CACHED_RADIUS:
+        return None
+
+    key = (color, radius)
+    sprite = _SPRITE_CACHE.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        _SPRITE_CACHE[key] = sprite
+    return sprite
 
 class CelestialObject:
     """Base class for all celestial objects."""
 
+    __slots__ = ('name', 'mass', 'position', 'velocity', 'color', 'size', 'force', 'trail', 'trail_count')
+
     SOLAR_MASS = 2e30
+
+    # Number of past positions kept for the trail effect
+    MAX_TRAIL_LENGTH = 50
+    SHOW_TRAIL = True
+
+    # Smallest radius the object is drawn with, in pixels
+    MIN_RADIUS = 1
+
+    # Identifies the object's class in the universe's type_id array
+    TYPE_ID = -1
     
     def __init__(self, name: str, mass: float, position: Tuple[float, float], 
                  velocity: Tuple[float, float], color: Tuple[int, int, int], size: int):
         self.name = name
         self.mass = mass
-        self.position = list(position)
-        self.velocity = list(velocity)
+        self.position = np.array(position, dtype=float)
+        self.velocity = np.array(velocity, dtype=float)
         self.color = color
         self.size = size
-        self.force = [0.0, 0.0]  # Current gravitational force
-        self.trail = []  # Position history for trail effect
-        self.max_trail_length = 50
+        self.force = np.zeros(2)  # Current gravitational force
+        # Position history for the trail effect, kept as a ring buffer; objects
+        # that never show a trail share an empty one
+        self.trail = np.zeros((self.MAX_TRAIL_LENGTH, 2)) if self.SHOW_TRAIL else _NO_TRAIL
+        self.trail_count = 0  # Number of positions recorded so far
         
-    def update_position(self, dt: float):
-        """Update position based on velocity."""
-        self.position[0] += self.velocity[0] * dt
-        self.position[1] += self.velocity[1] * dt
-        
-        # Add current position to trail
-        self.trail.append(tuple(self.position))
-        if len(self.trail) > self.max_trail_length:
-            self.trail.pop(0)
-    
-    def update_velocity(self, dt: float):
-        """Update velocity based on gravitational force."""
-        if self.mass > 0 and not isinstance(self, BlackHole):
-            acceleration_x = self.force[0] / self.mass
-            acceleration_y = self.force[1] / self.mass
-            self.velocity[0] += acceleration_x * dt
-            self.velocity[1] += acceleration_y * dt
-    
-    def reset_force(self):
-        """Reset gravitational force to zero."""
-        self.force = [0.0, 0.0]
-    
-    def add_force(self, force_x: float, force_y: float):
-        """Add gravitational force to the object."""
-        self.force[0] += force_x
-        self.force[1] += force_y
+    def record_trail(self):
+        """Add the current position to the trail."""
+        if self.SHOW_TRAIL:
+            self.trail[self.trail_count % self.MAX_TRAIL_LENGTH] = self.position
+            self.trail_count += 1
+
+    def get_trail(self) -> np.ndarray:
+        """Get an (N, 2) array of the recorded trail positions, oldest first."""
+        if self.trail_count <= self.MAX_TRAIL_LENGTH:
+            return self.trail[:self.trail_count]
+        oldest = self.trail_count % self.MAX_TRAIL_LENGTH
+        return np.concatenate((self.trail[oldest:], self.trail[:oldest]))
     
-    def draw(self, surface: pygame.Surface, camera_pos: Tuple[float, float], 
-             zoom: float, screen_size: Tuple[int, int]):
-        """Draw the object on the screen."""
-        from utils import world_to_screen
-        
-        # Draw trail
-        if len(self.trail) > 1:
-            trail_points = []
-            for trail_pos in self.trail:
-                screen_pos = world_to_screen(trail_pos, camera_pos, zoom, screen_size)
-                trail_points.append(screen_pos)
-            
-            if len(trail_points) > 1:
-                pygame.draw.lines(surface, self.color, False, trail_points, 1)
-        
-        # Draw object
-        screen_pos = world_to_screen(self.position, camera_pos, zoom, screen_size)
-        radius = max(1, int(self.size * zoom))
-        pygame.draw.circle(surface, self.color, screen_pos, radius)
+    def bind(self, position: np.ndarray, velocity: np.ndarray, force: np.ndarray):
+        """Copy the object's state into the given arrays and keep them as its state.
+
+        The arrays are normally views into the universe's physics arrays, so
+        the integrator updates the object in place.
+        """
+        position[:] = self.position
+        velocity[:] = self.velocity
+        force[:] = self.force
+        self.position = position
+        self.velocity = velocity
+        self.force = force
+
+    def sprite_key(self) -> tuple:
+        """Get a key shared by all objects that look the same at a given radius."""
+        return (type(self), self.color)
+
+    def sprite_extent(self, radius: int) -> int:
+        """Get the distance from the object's centre to the edge of its sprite."""
+        return radius
+
+    def get_sprite(self, radius: int) -> Optional[pygame.Surface]:
+        """Get the pre-rendered sprite for a radius, or None if it is too large to cache.
+
+        The radius must already be quantized with quantize_radii.
+        """
+        if radius > MAX_CACHED_RADIUS:
+            return None
+
+        key = (self.sprite_key(), radius)
+        sprite = _SPRITE_CACHE.get(key)
+        if sprite is None:
+            extent = self.sprite_extent(radius)
+            sprite = pygame.Surface((2 * extent + 1, 2 * extent + 1), pygame.SRCALPHA)
+            # Transparent pixels take the object's colour so that translucent
+            # layers blended onto the sprite keep their colour
+            sprite.fill((*self.color, 0))
+            self.render(sprite, (extent, extent), radius)
+            _SPRITE_CACHE[key] = sprite
+        return sprite
+
+    def render(self, surface: pygame.Surface, center: Tuple[int, int], radius: int):
+        """Draw the object centred on a point of the surface."""
+        pygame.draw.circle(surface, self.color, center, radius)
 
 class Star(CelestialObject):
     """A star object with high mass and luminosity."""
 
-    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float]):
-        mass = random.uniform(0.5 * self.SOLAR_MASS, 10 * self.SOLAR_MASS)  
-        size = random.randint(15, 30)  # Larger stars
+    __slots__ = ('luminosity', 'temperature', 'age')
+
+    TYPE_ID = 0
+
+    SHOW_TRAIL = False
+    MIN_RADIUS = 2
+
+    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float],
+                 rng: np.random.Generator):
+        mass = rng.uniform(0.5 * self.SOLAR_MASS, 10 * self.SOLAR_MASS)  
+        size = int(rng.integers(15, 30, endpoint=True))  # Larger stars
         super().__init__(name, mass, position, velocity, COLORS['star'], size)
         self.luminosity = mass / 1e30  # Relative to solar luminosity
-        self.temperature = random.uniform(3000, 50000)  # Kelvin
-        self.age = random.uniform(0, 1e10)  # Years
+        self.temperature = rng.uniform(3000, 50000)  # Kelvin
+        self.age = rng.uniform(0, 1e10)  # Years
         
-    def draw(self, surface: pygame.Surface, camera_pos: Tuple[float, float], 
-             zoom: float, screen_size: Tuple[int, int]):
+    def sprite_extent(self, radius: int) -> int:
+        """Get the distance from the star's centre to the edge of its glow."""
+        return radius * 2
+
+    def render(self, surface: pygame.Surface, center: Tuple[int, int], radius: int):
         """Draw star with glow effect."""
-        from utils import world_to_screen
-        
-        screen_pos = world_to_screen(self.position, camera_pos, zoom, screen_size)
-        radius = max(2, int(self.size * zoom))
-        
         # Draw glow effect
         glow_radius = radius * 2
         glow_surface = pygame.Surface((glow_radius * 2, glow_radius * 2), pygame.SRCALPHA)
@@ -94,13 +151,19 @@ class Star(CelestialObject):
             color = (*self.color, alpha)
             pygame.draw.circle(glow_surface, color, (glow_radius, glow_radius), glow_radius - i)
         
-        surface.blit(glow_surface, (screen_pos[0] - glow_radius, screen_pos[1] - glow_radius))
+        surface.blit(glow_surface, (center[0] - glow_radius, center[1] - glow_radius))
         
         # Draw core
-        pygame.draw.circle(surface, self.color, screen_pos, radius)
+        pygame.draw.circle(surface, self.color, center, radius)
 
 class Planet(CelestialObject):
-    """A planet object orbiting a star."""
+    """A planet drifting through space."""
+
+    __slots__ = ('atmosphere', 'water', 'temperature')
+
+    TYPE_ID = 1
+
+    SHOW_TRAIL = False
 
     MERCURY_MASS = 0.33e24
     JUPITER_MASS = 1898e24
@@ -109,102 +172,148 @@ class Planet(CelestialObject):
     JUPITER_DIAMETER = 142_984 // 2000
     
     def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float], 
-                 parent_star: Star = None):
-        mass = random.uniform(self.MERCURY_MASS - 2000, self.JUPITER_MASS + 2000)
-        size = random.randint(self.MERCURY_DIAMETER - 2000, self.JUPITER_DIAMETER + 2000)
+                 rng: np.random.Generator):
+        mass = rng.uniform(self.MERCURY_MASS - 2000, self.JUPITER_MASS + 2000)
+        size = int(rng.integers(self.MERCURY_DIAMETER - 2000, self.JUPITER_DIAMETER + 2000, endpoint=True))
         super().__init__(name, mass, position, velocity, COLORS['planet'], size)
-        self.parent_star = parent_star
-        self.atmosphere = random.choice([True, False])
-        self.water = random.choice([True, False])
-        self.temperature = random.uniform(200, 400)  # Kelvin
+        self.atmosphere = bool(rng.integers(2))
+        self.water = bool(rng.integers(2))
+        self.temperature = rng.uniform(200, 400)  # Kelvin
         
-    def draw(self, surface: pygame.Surface, camera_pos: Tuple[float, float], 
-             zoom: float, screen_size: Tuple[int, int]):
+    def sprite_key(self) -> tuple:
+        """Get a key shared by all planets that look the same at a given radius."""
+        return (type(self), self.color, self.atmosphere, self.water)
+
+    def sprite_extent(self, radius: int) -> int:
+        """Get the distance from the planet's centre to the edge of its atmosphere ring."""
+        return radius + 2
+
+    def render(self, surface: pygame.Surface, center: Tuple[int, int], radius: int):
         """Draw planet with atmosphere ring if applicable."""
-        from utils import world_to_screen
-        
-        screen_pos = world_to_screen(self.position, camera_pos, zoom, screen_size)
-        radius = max(1, int(self.size * zoom))
-        
         # Draw atmosphere ring
         if self.atmosphere:
             atmosphere_radius = radius + 2
-            pygame.draw.circle(surface, (100, 150, 255, 50), screen_pos, atmosphere_radius, 1)
+            pygame.draw.circle(surface, (100, 150, 255), center, atmosphere_radius, 1)
         
         # Draw planet
-        pygame.draw.circle(surface, self.color, screen_pos, radius)
+        pygame.draw.circle(surface, self.color, center, radius)
         
         # Draw water indicator
         if self.water:
             water_radius = max(1, radius // 2)
-            pygame.draw.circle(surface, (0, 200, 255), screen_pos, water_radius)
+            pygame.draw.circle(surface, (0, 200, 255), center, water_radius)
 
 class Asteroid(CelestialObject):
     """A small asteroid object."""
+
+    __slots__ = ('composition',)
+
+    TYPE_ID = 2
+
+    MAX_TRAIL_LENGTH = 20  # Shorter trail for asteroids
     
-    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float]):
-        mass = random.uniform(1e12, 1e15)  
-        size = random.randint(2, 5)  # Larger asteroids
+    COMPOSITIONS = ('rock', 'ice', 'metal')
+    
+    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float],
+                 rng: np.random.Generator):
+        mass = rng.uniform(1e12, 1e15)  
+        size = int(rng.integers(2, 5, endpoint=True))  # Larger asteroids
         super().__init__(name, mass, position, velocity, COLORS['asteroid'], size)
-        self.composition = random.choice(['rock', 'ice', 'metal'])
-        self.max_trail_length = 20  # Shorter trail for asteroids
+        self.composition = self.COMPOSITIONS[rng.integers(len(self.COMPOSITIONS))]
 
 class Nebula(CelestialObject):
     """A nebula - cloud of gas and dust."""
+
+    __slots__ = ('density', 'cloud_params', 'cloud_surface')
+
+    TYPE_ID = 3
+
+    MAX_TRAIL_LENGTH = 10  # Very short trail
+    SHOW_TRAIL = False
+    MIN_RADIUS = 5
+
+    CLOUD_COUNT = 5
     
-    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float]):
-        mass = random.uniform(1e22, 1e24)  
-        size = random.randint(20, 50)
+    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float],
+                 rng: np.random.Generator):
+        mass = rng.uniform(1e22, 1e24)  
+        size = int(rng.integers(20, 50, endpoint=True))
         super().__init__(name, mass, position, velocity, COLORS['nebula'], size)
-        self.density = random.uniform(0.1, 1.0)
-        self.max_trail_length = 10  # Very short trail
-        
-    def draw(self, surface: pygame.Surface, camera_pos: Tuple[float, float], 
-             zoom: float, screen_size: Tuple[int, int]):
+        self.density = rng.uniform(0.1, 1.0)
+        # Cloud layout as (offset x, offset y, radius) fractions of the nebula's radius and an alpha
+        offsets = rng.uniform(-1 / 3, 1 / 3, (self.CLOUD_COUNT, 2)).tolist()
+        radii = rng.uniform(0.5, 1.0, self.CLOUD_COUNT).tolist()
+        alphas = rng.integers(50, 150, self.CLOUD_COUNT, endpoint=True).tolist()
+        self.cloud_params = [(offset_x, offset_y, radius, alpha)
+                             for (offset_x, offset_y), radius, alpha in zip(offsets, radii, alphas)]
+        self.cloud_surface = None  # Cached (radius, surface) of the rendered clouds
+
+    def sprite_extent(self, radius: int) -> int:
+        """Get the distance from the nebula's centre to the edge of its clouds."""
+        # Clouds may be offset by up to a third of the radius
+        return radius + radius // 3
+
+    def get_sprite(self, radius: int) -> Optional[pygame.Surface]:
+        """Get this nebula's cloud sprite for a radius, or None if it is too large to cache."""
+        # Every nebula has its own cloud layout, so the sprite is cached per instance
+        if radius > MAX_CACHED_RADIUS:
+            return None
+
+        if self.cloud_surface is None or self.cloud_surface[0] != radius:
+            extent = self.sprite_extent(radius)
+            cloud_surface = pygame.Surface((2 * extent + 1, 2 * extent + 1), pygame.SRCALPHA)
+            cloud_surface.fill((*self.color, 0))
+            self.render(cloud_surface, (extent, extent), radius)
+            self.cloud_surface = (radius, cloud_surface)
+        return self.cloud_surface[1]
+
+    def render(self, surface: pygame.Surface, center: Tuple[int, int], radius: int):
         """Draw nebula as a cloud-like structure."""
-        from utils import world_to_screen
-        
-        screen_pos = world_to_screen(self.position, camera_pos, zoom, screen_size)
-        radius = max(5, int(self.size * zoom))
-        
         # Draw multiple overlapping circles for cloud effect
-        for i in range(5):
-            offset_x = random.randint(-radius//3, radius//3)
-            offset_y = random.randint(-radius//3, radius//3)
-            cloud_radius = random.randint(radius//2, radius)
-            alpha = random.randint(50, 150)
+        for offset_x, offset_y, cloud_radius, alpha in self.cloud_params:
+            offset_x = int(offset_x * radius)
+            offset_y = int(offset_y * radius)
+            cloud_radius = max(1, int(cloud_radius * radius))
             
             cloud_surface = pygame.Surface((cloud_radius * 2, cloud_radius * 2), pygame.SRCALPHA)
             cloud_color = (*self.color, alpha)
             pygame.draw.circle(cloud_surface, cloud_color, (cloud_radius, cloud_radius), cloud_radius)
             
-            surface.blit(cloud_surface, (screen_pos[0] - cloud_radius + offset_x, 
-                                       screen_pos[1] - cloud_radius + offset_y))
+            surface.blit(cloud_surface, (center[0] - cloud_radius + offset_x, 
+                                       center[1] - cloud_radius + offset_y))
 
 class BlackHole(CelestialObject):
     """A black hole with extreme gravitational pull."""
+
+    __slots__ = ('event_horizon_radius',)
+
+    TYPE_ID = 4
+
+    SHOW_TRAIL = False
+    MIN_RADIUS = 2
     
-    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float]):
-        mass = random.uniform(self.SOLAR_MASS, 10e4 * self.SOLAR_MASS)  
-        size = random.randint(5, 15)
+    def __init__(self, name: str, position: Tuple[float, float], velocity: Tuple[float, float],
+                 rng: np.random.Generator):
+        mass = rng.uniform(self.SOLAR_MASS, 10e4 * self.SOLAR_MASS)  
+        size = int(rng.integers(5, 15, endpoint=True))
         super().__init__(name, mass, position, velocity, COLORS['black_hole'], size)
         self.event_horizon_radius = size * 2
         
-    def draw(self, surface: pygame.Surface, camera_pos: Tuple[float, float], 
-             zoom: float, screen_size: Tuple[int, int]):
+    def sprite_extent(self, radius: int) -> int:
+        """Get the distance from the black hole's centre to the edge of its accretion disk."""
+        return max(4, radius * 2) + 5
+
+    def render(self, surface: pygame.Surface, center: Tuple[int, int], radius: int):
         """Draw black hole with event horizon."""
-        from utils import world_to_screen
-        
-        screen_pos = world_to_screen(self.position, camera_pos, zoom, screen_size)
-        radius = max(2, int(self.size * zoom))
-        event_horizon_radius = max(4, int(self.event_horizon_radius * zoom))
+        # The event horizon is twice the size of the black hole
+        event_horizon_radius = max(4, radius * 2)
         
         # Draw event horizon
-        pygame.draw.circle(surface, (50, 50, 50), screen_pos, event_horizon_radius, 2)
+        pygame.draw.circle(surface, (50, 50, 50), center, event_horizon_radius, 2)
         
         # Draw black hole core
-        pygame.draw.circle(surface, self.color, screen_pos, radius)
+        pygame.draw.circle(surface, self.color, center, radius)
         
         # Draw accretion disk
         disk_radius = event_horizon_radius + 5
-        pygame.draw.circle(surface, (255, 100, 0), screen_pos, disk_radius, 1) 
\ No newline at end of file
+        pygame.draw.circle(surface, (255, 100, 0), center, disk_radius, 1)
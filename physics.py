@@ -1,94 +1,130 @@
 import logging
 import math
-from typing import List 
-from utils import calculate_distance
+import numpy as np
+from typing import Optional
 from objects import CelestialObject
+from physics_kernels import compute_forces, fused_step
+from cuda_kernels import compute_forces_cuda, cuda_available
+from quadtree import QuadTree
 
 logger = logging.getLogger(__name__)
 
 class PhysicsEngine:
-    """Physics engine for gravitational calculations and orbital mechanics."""
+    """Physics engine for gravitational calculations and collisions."""
 
     # Scales down force applied for gravity calculation
     FORCE_CONSTANT = 1*10e-11
 
     G = 6.67430e-15  # Much smaller gravitational constant for stability
-    
+
+    # Plummer softening length added to every pairwise separation; must be
+    # positive so that coincident objects never divide by zero
+    SOFTENING_LENGTH = 1.0
+
+    # Pairs further apart than this exert no force on each other
+    CUTOFF_DISTANCE = math.inf
+
+    # Above this many objects gravity is approximated with a Barnes-Hut tree,
+    # opening tree nodes whose size/distance ratio is at least BARNES_HUT_THETA,
+    # or summed directly on the GPU when CUDA is available
+    BARNES_HUT_THRESHOLD = 2000
+    BARNES_HUT_THETA = 0.5
+
     def __init__(self):
         self.gravity_enabled = True
         self.collision_detection = True
+        self.use_cuda = cuda_available()
         
-    def calculate_gravitational_forces(self, objects: List[CelestialObject]):
-        """Calculate gravitational forces between all objects."""
+    def calculate_gravitational_forces(self, positions: np.ndarray, masses: np.ndarray, forces: np.ndarray,
+                                       spatial_index: QuadTree):
+        """Calculate gravitational forces between all objects.
+
+        ``positions`` and ``forces`` are (2, N) arrays and ``masses`` is an (N,)
+        array; the net force on each object is written into ``forces``.
+        ``spatial_index`` must be built over the same positions and masses.
+        """
         if not self.gravity_enabled:
+            forces.fill(0.0)
             return
-            
-        # Reset all forces
-        for obj in objects:
-            obj.reset_force()
-        
-        # Calculate gravitational forces between all pairs
-        for i, obj1 in enumerate(objects):
-            for j, obj2 in enumerate(objects):
-                if i != j and obj1.mass > 0 and obj2.mass > 0:
-                    distance = calculate_distance(obj1.position, obj2.position)
-                    
-                    if distance > 0:
-                        # Calculate gravitational force
-                        force_magnitude = self.calculate_gravitational_force(obj1.mass, obj2.mass, distance)
-                        
-                        # Calculate force direction
-                        dx = obj2.position[0] - obj1.position[0]
-                        dy = obj2.position[1] - obj1.position[1]
-                        
-                        # Normalize direction vector
-                        length = math.sqrt(dx*dx + dy*dy)
-                        if length > 0:
-                            dx /= length
-                            dy /= length
-                            
-                            # Apply force to both objects (equal and opposite)
-                            force_x = force_magnitude * dx * self.FORCE_CONSTANT
-                            force_y = force_magnitude * dy * self.FORCE_CONSTANT
-                            
-                            obj1.add_force(force_x, force_y)
-                            obj2.add_force(-force_x, -force_y)
-
-    def calculate_gravitational_force(self, mass1: float, mass2: float, distance: float) -> float:
-        """Calculate gravitational force between two objects."""
-        if distance == 0:
-            return 0
-        return self.G * mass1 * mass2 / (distance * distance)
-    
-    def update_objects(self, objects: List[CelestialObject], time_step):
-        """Update positions and velocities of all objects."""
+
+        G = self.G * self.FORCE_CONSTANT
+        soft2 = self.SOFTENING_LENGTH ** 2
+        cut2 = self.CUTOFF_DISTANCE ** 2
+
+        if len(masses) > self.BARNES_HUT_THRESHOLD and self.use_cuda:
+            compute_forces_cuda(positions[0], positions[1], masses, forces[0], forces[1], G, soft2, cut2)
+        elif len(masses) > self.BARNES_HUT_THRESHOLD:
+            spatial_index.compute_forces(positions[0], positions[1], masses, forces[0], forces[1],
+                                         G, soft2, cut2, self.BARNES_HUT_THETA)
+        else:
+            compute_forces(positions[0], positions[1], masses, forces[0], forces[1], G, soft2, cut2)
+
+    def step(self, positions: np.ndarray, velocities: np.ndarray, forces: np.ndarray, masses: np.ndarray,
+             inverse_masses: np.ndarray, sizes: np.ndarray, time_step, spatial_index: QuadTree,
+             moved: Optional[np.ndarray] = None) -> np.ndarray:
+        """Advance all objects by one time step.
+
+        Returns the sorted (K, 2) array of index pairs of colliding objects,
+        tested at the positions before the step. Below the Barnes-Hut
+        threshold, forces, integration and collision tests share a single
+        pass over the pairs of objects; above it, forces (unless they are
+        summed on the GPU) and collisions use ``spatial_index``, which must be
+        built over the current positions and masses and is not rebuilt here,
+        and only objects flagged in ``moved`` are tested. On that path the
+        flags are updated in place to mark the objects the step moved.
+        """
+        if len(masses) > self.BARNES_HUT_THRESHOLD:
+            self.calculate_gravitational_forces(positions, masses, forces, spatial_index)
+            collision_pairs = self.check_collisions(spatial_index, sizes, moved)
+            self.update_objects(positions, velocities, forces, inverse_masses, time_step)
+
+            if moved is not None:
+                # Untested objects stay flagged until collision detection is back on
+                stepped = (velocities != 0.0).any(axis=0) if time_step else np.zeros(len(masses), dtype=bool)
+                if self.collision_detection:
+                    moved[:] = stepped
+                else:
+                    moved |= stepped
+        else:
+            G = self.G * self.FORCE_CONSTANT if self.gravity_enabled else 0.0
+            collision_pairs = fused_step(positions, velocities, forces, masses, inverse_masses, sizes, G,
+                                         self.SOFTENING_LENGTH ** 2, self.CUTOFF_DISTANCE ** 2, time_step,
+                                         self.collision_detection)
+            if moved is not None:
+                # Every pair is tested here, so the flags are not tracked
+                moved[:] = True
+        return collision_pairs
+
+    def update_objects(self, positions: np.ndarray, velocities: np.ndarray, forces: np.ndarray,
+                       inverse_masses: np.ndarray, time_step):
+        """Update positions and velocities of all objects in place.
+
+        Objects with an inverse mass of zero are not accelerated by gravity.
+        """
         dt = time_step
-        
-        # Update velocities based on forces
-        for obj in objects:
-            obj.update_velocity(dt)
-        
-        # Update positions based on velocities
-        for obj in objects:
-            obj.update_position(dt)
+        velocities += forces * inverse_masses * dt
+        positions += velocities * dt
             
-    def check_collisions(self, objects: List[CelestialObject]):
-        """Check for collisions between objects."""
+    def build_spatial_index(self, positions: np.ndarray, masses: np.ndarray,
+                            spatial_index: Optional[QuadTree] = None) -> QuadTree:
+        """Build a quadtree over the objects, reusing the node arrays of a previous one if given."""
+        if spatial_index is None:
+            return QuadTree(positions[0], positions[1], masses)
+        spatial_index.rebuild(positions[0], positions[1], masses)
+        return spatial_index
+
+    def check_collisions(self, spatial_index: QuadTree, sizes: np.ndarray,
+                         moved: Optional[np.ndarray] = None) -> np.ndarray:
+        """Check for collisions between objects.
+
+        Returns the sorted (K, 2) array of index pairs (i < j) of objects
+        closer than the sum of their sizes; each object only searches the
+        tree nodes within its reach. If ``moved`` is given, pairs of objects
+        that have not moved since the last check are skipped.
+        """
         if not self.collision_detection:
-            return
-            
-        collisions = []
-        
-        for i, obj1 in enumerate(objects):
-            for j, obj2 in enumerate(objects):
-                if i < j:  # Avoid checking same pair twice
-                    distance = calculate_distance(obj1.position, obj2.position)
-                    collision_threshold = obj1.size + obj2.size
-                    
-                    if distance < collision_threshold:
-                        collisions.append((obj1, obj2))
-        
-        return collisions
+            return np.zeros((0, 2), dtype=np.int64)
+        return spatial_index.find_collisions(sizes, moved)
     
     def handle_collision(self, obj1: CelestialObject, obj2: CelestialObject):
         """Handle collision between two objects."""
@@ -96,30 +132,3 @@ class PhysicsEngine:
         smaller_object = obj2 if obj1.mass >= obj2.mass else obj1
         print(f"Handling collision between {obj1.name} and {obj2.name}. Removing {smaller_object.name}")
         return smaller_object
-
-    def calculate_orbital_velocity(self, central_mass: float, distance: float) -> float:
-        """Calculate orbital velocity for a circular orbit."""
-        if distance <= 0 or central_mass <= 0:
-            return 0
-        return math.sqrt(self.G * central_mass / distance)
-    
-    def create_stable_orbit(self, central_object: CelestialObject, 
-                           orbiting_object: CelestialObject, 
-                           orbital_distance: float):
-        """Set up a stable circular orbit around a central object."""
-        if central_object.mass <= 0 or orbital_distance <= 0:
-            return
-            
-        # Calculate orbital velocity
-        orbital_velocity = self.calculate_orbital_velocity(central_object.mass, orbital_distance)
-        
-        # Position the orbiting object at the specified distance
-        angle = math.atan2(orbiting_object.position[1] - central_object.position[1],
-                          orbiting_object.position[0] - central_object.position[0])
-        
-        orbiting_object.position[0] = central_object.position[0] + orbital_distance * math.cos(angle)
-        orbiting_object.position[1] = central_object.position[1] + orbital_distance * math.sin(angle)
-        
-        # Set velocity for circular orbit (perpendicular to position vector)
-        orbiting_object.velocity[0] = central_object.velocity[0] - orbital_velocity * math.sin(angle)
-        orbiting_object.velocity[1] = central_object.velocity[1] + orbital_velocity * math.cos(angle)
@@ -0,0 +1,146 @@
+import math
+import numpy as np
+from numba import njit, prange, get_num_threads
+from bodies import PROPERTY_DTYPE
+
+def compute_forces(pos_x, pos_y, mass, fx, fy, G, soft2, cut2):
+    """Compute the net gravitational force on every body by direct summation.
+
+    ``soft2`` is the squared softening length and must be positive; pairs
+    whose softened squared separation exceeds ``cut2`` are skipped.
+    """
+    # The fused kernel without collisions and with zero inverse masses and
+    # time step, so that it leaves the bodies where they are
+    n = pos_x.shape[0]
+    _fused_step(pos_x, pos_y, np.zeros(n), np.zeros(n), fx, fy, mass, np.zeros_like(mass), mass,
+                G, soft2, cut2, 0.0, False, max(1, min(get_num_threads(), n)), 0)
+
+def nearest_body(pos_x, pos_y, x, y):
+    """Get the index of the body nearest to (x, y) and its squared distance; there must be at least one body."""
+    return _nearest(pos_x, pos_y, float(x), float(y), get_num_threads())
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _nearest(pos_x, pos_y, x, y, threads):
+    """Find the minimum squared distance in contiguous chunks in parallel, then across chunks."""
+    n = pos_x.shape[0]
+    chunks = max(1, min(threads, n))
+    chunk_index = np.zeros(chunks, dtype=np.int64)
+    chunk_d2 = np.zeros(chunks)
+    for c in prange(chunks):
+        start = c * n // chunks
+        stop = (c + 1) * n // chunks
+        best = start
+        best_d2 = (pos_x[start] - x) ** 2 + (pos_y[start] - y) ** 2
+        for i in range(start + 1, stop):
+            dx = pos_x[i] - x
+            dy = pos_y[i] - y
+            d2 = dx * dx + dy * dy
+            if d2 < best_d2:
+                best = i
+                best_d2 = d2
+        chunk_index[c] = best
+        chunk_d2[c] = best_d2
+
+    # Earlier chunks win ties, so the lowest index is returned as with argmin
+    best = 0
+    for c in range(1, chunks):
+        if chunk_d2[c] < chunk_d2[best]:
+            best = c
+    return chunk_index[best], chunk_d2[best]
+
+def fused_step(pos, vel, force, mass, inv_mass, size, G, soft2, cut2, dt, collide):
+    """Compute forces, integrate and find colliding pairs in one pass over the bodies.
+
+    Collisions are tested at the positions the forces are computed from,
+    before integration. Returns a (K, 2) array of the index pairs (i < j)
+    whose separation is less than the sum of their sizes, in ascending order.
+    """
+    n = pos.shape[1]
+    chunks = max(1, min(get_num_threads(), n))
+    capacity = 4 * n // chunks + 64
+    while True:
+        pairs, counts = _fused_step(pos[0], pos[1], vel[0], vel[1], force[0], force[1], mass, inv_mass, size,
+                                    G, soft2, cut2, float(dt), collide, chunks, capacity)
+        if counts.max(initial=0) <= capacity:
+            break
+        # A chunk ran out of room for its pairs; the state has not been touched yet
+        capacity = int(counts.max())
+
+    found = np.concatenate([pairs[c, :counts[c]] for c in range(chunks)]) if n else np.zeros((0, 2), dtype=np.int64)
+    return found[np.lexsort((found[:, 1], found[:, 0]))]
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _fused_step(pos_x, pos_y, vel_x, vel_y, fx, fy, mass, inv_mass, size,
+                G, soft2, cut2, dt, collide, chunks, capacity):
+    """Symmetric pair pass accumulating forces and collisions per chunk, then a reduce-and-integrate pass.
+
+    Each pair is visited once and its force is applied to both bodies with
+    opposite signs. Rows are dealt out round-robin to one partial force
+    buffer per thread, so the shrinking rows of the triangle stay balanced
+    and no two threads write to the same element; the buffers are summed
+    at the end. Returns the per-chunk pair buffers and pair counts. If any count exceeds
+    ``capacity`` the bodies are left unchanged so the step can be retried.
+    """
+    n = pos_x.shape[0]
+    partial_x = np.zeros((chunks, n))
+    partial_y = np.zeros((chunks, n))
+    pairs = np.empty((chunks, capacity, 2), dtype=np.int64)
+    counts = np.zeros(chunks, dtype=np.int64)
+    for c in prange(chunks):
+        px = partial_x[c]
+        py = partial_y[c]
+        found = 0
+        for i in range(c, n, chunks):
+            ax = 0.0
+            ay = 0.0
+            for j in range(i + 1, n):
+                dx = pos_x[j] - pos_x[i]
+                dy = pos_y[j] - pos_y[i]
+                d2 = dx * dx + dy * dy
+                if collide:
+                    # Objects with a negative combined size never collide
+                    threshold = size[i] + size[j]
+                    if threshold > 0.0 and d2 < threshold * threshold:
+                        if found < capacity:
+                            pairs[c, found, 0] = i
+                            pairs[c, found, 1] = j
+                        found += 1
+                r2 = d2 + soft2
+                if r2 > cut2:
+                    continue
+                inv = 1.0 / (r2 * math.sqrt(r2))
+                f = G * mass[i] * mass[j] * inv
+                ax += f * dx
+                ay += f * dy
+                px[j] -= f * dx
+                py[j] -= f * dy
+            px[i] += ax
+            py[i] += ay
+        counts[c] = found
+
+    if counts.max() > capacity:
+        return pairs, counts
+
+    for i in prange(n):
+        sx = 0.0
+        sy = 0.0
+        for c in range(chunks):
+            sx += partial_x[c, i]
+            sy += partial_y[c, i]
+        fx[i] = sx
+        fy[i] = sy
+        vel_x[i] += sx * inv_mass[i] * dt
+        vel_y[i] += sy * inv_mass[i] * dt
+        pos_x[i] += vel_x[i] * dt
+        pos_y[i] += vel_y[i] * dt
+    return pairs, counts
+
+def _warm_up():
+    """Compile the kernels with the argument types the simulation uses, so the first frame does not stall."""
+    pos = np.array([[0.0, 1.0], [0.0, 0.0]])
+    mass = np.ones(2, dtype=PROPERTY_DTYPE)
+    compute_forces(pos[0], pos[1], mass, np.zeros(2), np.zeros(2), 1.0, 1.0, math.inf)
+    nearest_body(pos[0], pos[1], 0.0, 0.0)
+    fused_step(pos, np.zeros((2, 2)), np.zeros((2, 2)), mass, mass, mass, 1.0, 1.0, math.inf, 0.0, True)
+
+_warm_up()
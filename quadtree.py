@@ -0,0 +1,400 @@
+import math
+import numpy as np
+from typing import Optional
+from numba import njit, prange, get_num_threads
+from bodies import PROPERTY_DTYPE
+
+# Bits of each coordinate interleaved into a Morton code; this is also the
+# depth of the deepest level of the tree
+MORTON_BITS = 30
+
+# Nodes with at most this many bodies are not split any further
+LEAF_SIZE = 8
+
+STACK_SIZE = 4 * (MORTON_BITS + 1)
+
+class QuadTree:
+    """Barnes-Hut quadtree over a set of point masses, built from Morton codes.
+
+    Bodies are sorted by the Morton (Z-order) code of their position, so the
+    bodies beneath any node are a contiguous run of ``order``. Nodes are
+    stored as flat arrays indexed by node id, with node 0 as the root. Each
+    node records the total mass and centre of mass of the bodies beneath it
+    so that distant clusters can be treated as a single body; leaves hold up
+    to LEAF_SIZE bodies, which are always visited one by one.
+    """
+
+    def __init__(self, pos_x: np.ndarray, pos_y: np.ndarray, mass: np.ndarray):
+        self.capacity = 0
+        self.rebuild(pos_x, pos_y, mass)
+
+    def rebuild(self, pos_x: np.ndarray, pos_y: np.ndarray, mass: np.ndarray):
+        """Rebuild the tree for new positions, reusing the node arrays when they are large enough."""
+        n = len(pos_x)
+        if n > 0:
+            min_x, max_x = pos_x.min(), pos_x.max()
+            min_y, max_y = pos_y.min(), pos_y.max()
+        else:
+            min_x = max_x = min_y = max_y = 0.0
+        # The root is a square slightly larger than the bounding box
+        size = max(max_x - min_x, max_y - min_y) * (1.0 + 1e-9) + 1e-9
+        codes = _morton_codes(pos_x, pos_y, min_x, min_y, (1 << MORTON_BITS) / size)
+        self.order = np.argsort(codes, kind='stable')
+        codes = codes[self.order]
+
+        # Bodies may sit up to a deepest-level cell outside their node's cell
+        # after rounding, so spatial tests pad cells by this much
+        self.leaf_width = size / (1 << MORTON_BITS)
+        self.pos_x = pos_x
+        self.pos_y = pos_y
+
+        if self.capacity < n + 64:
+            self._allocate(2 * n + 64)
+        while True:
+            self.node_count = _build(codes, self.order, pos_x, pos_y, mass, min_x + 0.5 * size,
+                                     min_y + 0.5 * size, 0.5 * size, self.children, self.start,
+                                     self.count, self.mass, self.com_x, self.com_y, self.center_x,
+                                     self.center_y, self.half_size)
+            if self.node_count >= 0:
+                break
+            self._allocate(2 * self.capacity)
+
+    def _allocate(self, capacity: int):
+        """Allocate node arrays for a number of nodes."""
+        self.capacity = capacity
+        self.children = np.empty((4, capacity), dtype=np.int64)
+        self.start = np.empty(capacity, dtype=np.int64)
+        self.count = np.empty(capacity, dtype=np.int64)
+        self.mass = np.empty(capacity)
+        self.com_x = np.empty(capacity)
+        self.com_y = np.empty(capacity)
+        self.center_x = np.empty(capacity)
+        self.center_y = np.empty(capacity)
+        self.half_size = np.empty(capacity)
+
+    def compute_forces(self, pos_x: np.ndarray, pos_y: np.ndarray, mass: np.ndarray,
+                       fx: np.ndarray, fy: np.ndarray, G: float, soft2: float, cut2: float, theta: float):
+        """Approximate the net gravitational force on every body.
+
+        ``soft2`` is the squared softening length and must be positive; nodes
+        whose softened squared distance exceeds ``cut2`` are skipped.
+        """
+        _tree_forces(self.children, self.start, self.count, self.mass, self.com_x, self.com_y,
+                     self.half_size, self.order, pos_x, pos_y, mass, fx, fy, G, soft2, cut2, theta)
+
+    def find_collisions(self, size: np.ndarray, moved: Optional[np.ndarray] = None) -> np.ndarray:
+        """Get the sorted (K, 2) index pairs (i < j) whose separation is less than the sum of their sizes.
+
+        If ``moved`` is given, only pairs with at least one moved body are
+        tested; the others were already tested at the same positions.
+        """
+        n = len(self.order)
+        if n == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        if moved is None:
+            moved = np.ones(n, dtype=bool)
+
+        # Each body only searches as far as it could reach the largest body
+        reach_pad = size.max() + self.leaf_width
+        words = _pack_bits(moved)
+        chunks = max(1, min(get_num_threads(), len(words)))
+        capacity = 4 * n // chunks + 64
+        while True:
+            pairs, counts = _tree_collisions(self.children, self.start, self.count, self.center_x,
+                                             self.center_y, self.half_size, self.order, self.pos_x,
+                                             self.pos_y, size, moved, words, reach_pad, chunks, capacity)
+            if counts.max() <= capacity:
+                break
+            capacity = int(counts.max())
+
+        found = np.concatenate([pairs[c, :counts[c]] for c in range(chunks)])
+        return found[np.lexsort((found[:, 1], found[:, 0]))]
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """Get the sorted indices of the bodies whose positions lie inside a rectangle."""
+        return np.sort(_tree_query(self.children, self.start, self.count, self.center_x, self.center_y,
+                                   self.half_size, self.order, self.pos_x, self.pos_y, self.leaf_width,
+                                   float(min_x), float(min_y), float(max_x), float(max_y)))
+
+def _pack_bits(mask: np.ndarray) -> np.ndarray:
+    """Pack a boolean mask into 64-bit words; bit k of word w is ``mask[64 * w + k]``."""
+    packed = np.zeros((len(mask) + 63) // 64 * 8, dtype=np.uint8)
+    packed[:(len(mask) + 7) // 8] = np.packbits(mask, bitorder='little')
+    return packed.view('<u8').astype(np.uint64)
+
+@njit(cache=True)
+def _spread_bits(value):
+    """Insert a zero bit between each of the low 32 bits of a value."""
+    value &= 0xFFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+@njit(parallel=True, cache=True)
+def _morton_codes(pos_x, pos_y, min_x, min_y, scale):
+    """Interleave the quantized coordinates of every body, x in the even bits and y in the odd bits."""
+    n = pos_x.shape[0]
+    codes = np.empty(n, dtype=np.int64)
+    top = (1 << MORTON_BITS) - 1
+    for i in prange(n):
+        qx = min(max(int((pos_x[i] - min_x) * scale), 0), top)
+        qy = min(max(int((pos_y[i] - min_y) * scale), 0), top)
+        codes[i] = _spread_bits(qx) | (_spread_bits(qy) << 1)
+    return codes
+
+@njit(cache=True)
+def _first_at_least(codes, lo, hi, shift, quadrant):
+    """Index of the first code in the sorted run [lo, hi) whose quadrant at ``shift`` is at least ``quadrant``."""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if (codes[mid] >> shift) & 3 < quadrant:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+@njit(cache=True)
+def _is_leaf(children, node):
+    """Whether a node has no children."""
+    return (children[0, node] == -1 and children[1, node] == -1
+            and children[2, node] == -1 and children[3, node] == -1)
+
+@njit(cache=True)
+def _build(codes, order, pos_x, pos_y, mass, root_x, root_y, root_half, children,
+           start, count, node_mass, com_x, com_y, center_x, center_y, half_size):
+    """Split runs of Morton-sorted bodies into quadrants; returns the node count, or -1 if out of capacity."""
+    capacity = start.shape[0]
+    parent = np.empty(capacity, dtype=np.int64)
+    level = np.empty(capacity, dtype=np.int64)
+
+    start[0] = 0
+    count[0] = codes.shape[0]
+    center_x[0] = root_x
+    center_y[0] = root_y
+    half_size[0] = root_half
+    parent[0] = -1
+    level[0] = 0
+    node_count = 1
+
+    # Nodes are created in breadth-first order, so every child has a larger
+    # id than its parent
+    node = 0
+    while node < node_count:
+        children[:, node] = -1
+        lo = start[node]
+        hi = lo + count[node]
+        if hi - lo > LEAF_SIZE and level[node] < MORTON_BITS:
+            # Within a node the codes agree above this level, so each
+            # quadrant's bodies are a contiguous part of the node's run
+            shift = 2 * (MORTON_BITS - 1 - level[node])
+            quarter = 0.5 * half_size[node]
+            for quadrant in range(4):
+                end = _first_at_least(codes, lo, hi, shift, quadrant + 1) if quadrant < 3 else hi
+                if end > lo:
+                    if node_count == capacity:
+                        return -1
+                    child = node_count
+                    node_count += 1
+                    children[quadrant, node] = child
+                    start[child] = lo
+                    count[child] = end - lo
+                    center_x[child] = center_x[node] + (quarter if quadrant & 1 else -quarter)
+                    center_y[child] = center_y[node] + (quarter if quadrant & 2 else -quarter)
+                    half_size[child] = quarter
+                    parent[child] = node
+                    level[child] = level[node] + 1
+                lo = end
+        node += 1
+
+    # Sum the bodies of each leaf, then push the mass moments up to the root
+    for node in range(node_count):
+        node_mass[node] = 0.0
+        com_x[node] = 0.0
+        com_y[node] = 0.0
+        if _is_leaf(children, node):
+            for k in range(start[node], start[node] + count[node]):
+                b = order[k]
+                node_mass[node] += mass[b]
+                com_x[node] += mass[b] * pos_x[b]
+                com_y[node] += mass[b] * pos_y[b]
+    for node in range(node_count - 1, 0, -1):
+        node_mass[parent[node]] += node_mass[node]
+        com_x[parent[node]] += com_x[node]
+        com_y[parent[node]] += com_y[node]
+
+    # Convert mass moments into centres of mass; massless nodes use their centre
+    for node in range(node_count):
+        if node_mass[node] > 0.0:
+            com_x[node] /= node_mass[node]
+            com_y[node] /= node_mass[node]
+        else:
+            com_x[node] = center_x[node]
+            com_y[node] = center_y[node]
+    return node_count
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _tree_forces(children, start, count, node_mass, com_x, com_y, half_size, order,
+                 pos_x, pos_y, mass, fx, fy, G, soft2, cut2, theta):
+    """Walk the tree once per body, opening nodes that fail the s/d < theta test."""
+    n = pos_x.shape[0]
+    theta2 = theta * theta
+    for i in prange(n):
+        stack = np.empty(STACK_SIZE, dtype=np.int64)
+        stack[0] = 0
+        top = 1
+        ax = 0.0
+        ay = 0.0
+        while top > 0:
+            top -= 1
+            node = stack[top]
+            if node_mass[node] == 0.0:
+                continue
+
+            if _is_leaf(children, node):
+                # Bodies in a leaf are summed directly
+                for k in range(start[node], start[node] + count[node]):
+                    j = order[k]
+                    if j == i:
+                        continue
+                    dx = pos_x[j] - pos_x[i]
+                    dy = pos_y[j] - pos_y[i]
+                    r2 = dx * dx + dy * dy + soft2
+                    if r2 > cut2:
+                        continue
+                    f = G * mass[j] / (r2 * math.sqrt(r2))
+                    ax += f * dx
+                    ay += f * dy
+                continue
+
+            dx = com_x[node] - pos_x[i]
+            dy = com_y[node] - pos_y[i]
+            d2 = dx * dx + dy * dy
+            width = 2.0 * half_size[node]
+            if width * width >= theta2 * d2:
+                for quadrant in range(4):
+                    child = children[quadrant, node]
+                    if child != -1:
+                        stack[top] = child
+                        top += 1
+                continue
+
+            r2 = d2 + soft2
+            if r2 > cut2:
+                continue
+            f = G * node_mass[node] / (r2 * math.sqrt(r2))
+            ax += f * dx
+            ay += f * dy
+        fx[i] = ax * mass[i]
+        fy[i] = ay * mass[i]
+
+@njit(parallel=True, cache=True)
+def _tree_collisions(children, start, count, center_x, center_y, half_size, order,
+                     pos_x, pos_y, size, moved, words, reach_pad, chunks, capacity):
+    """Query the reach of each moved body against the tree, recording overlapping pairs per chunk.
+
+    Words of the moved bit-set are dealt out round-robin to the chunks and
+    their set bits visited lowest first, so bodies at rest cost nothing.
+    Returns the pair buffers and pair counts; a count above ``capacity``
+    means the chunk ran out of room and the query must be repeated.
+    """
+    pairs = np.empty((chunks, capacity, 2), dtype=np.int64)
+    counts = np.zeros(chunks, dtype=np.int64)
+    one = np.uint64(1)
+    for c in prange(chunks):
+        stack = np.empty(STACK_SIZE, dtype=np.int64)
+        found = 0
+        for w in range(c, words.shape[0], chunks):
+            bits = words[w]
+            while bits != 0:
+                lowest = bits & (~bits + one)
+                bits ^= lowest
+                # A power of two converts to float exactly
+                i = 64 * w + int(math.log2(float(lowest)))
+                reach = size[i] + reach_pad
+                if reach <= 0.0:
+                    continue
+                stack[0] = 0
+                top = 1
+                while top > 0:
+                    top -= 1
+                    node = stack[top]
+                    # Skip nodes whose cell lies entirely outside the body's reach
+                    if (abs(center_x[node] - pos_x[i]) > half_size[node] + reach
+                            or abs(center_y[node] - pos_y[i]) > half_size[node] + reach):
+                        continue
+                    if not _is_leaf(children, node):
+                        for quadrant in range(4):
+                            child = children[quadrant, node]
+                            if child != -1:
+                                stack[top] = child
+                                top += 1
+                        continue
+
+                    for k in range(start[node], start[node] + count[node]):
+                        j = order[k]
+                        # A pair of moved bodies is recorded by the lower index only
+                        if j == i or (moved[j] and j < i):
+                            continue
+                        # Objects with a negative combined size never collide
+                        threshold = size[i] + size[j]
+                        dx = pos_x[j] - pos_x[i]
+                        dy = pos_y[j] - pos_y[i]
+                        if threshold > 0.0 and dx * dx + dy * dy < threshold * threshold:
+                            if found < capacity:
+                                pairs[c, found, 0] = min(i, j)
+                                pairs[c, found, 1] = max(i, j)
+                            found += 1
+        counts[c] = found
+    return pairs, counts
+
+@njit(cache=True)
+def _tree_query(children, start, count, center_x, center_y, half_size, order,
+                pos_x, pos_y, pad, min_x, min_y, max_x, max_y):
+    """Collect the bodies inside a rectangle, taking nodes that lie wholly inside it without testing."""
+    found = np.empty(order.shape[0], dtype=np.int64)
+    total = 0
+    if order.shape[0] == 0:
+        return found
+    stack = np.empty(STACK_SIZE, dtype=np.int64)
+    stack[0] = 0
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        reach = half_size[node] + pad
+        low_x = center_x[node] - reach
+        high_x = center_x[node] + reach
+        low_y = center_y[node] - reach
+        high_y = center_y[node] + reach
+        if high_x < min_x or low_x > max_x or high_y < min_y or low_y > max_y:
+            continue
+
+        inside = low_x >= min_x and high_x <= max_x and low_y >= min_y and high_y <= max_y
+        if inside or _is_leaf(children, node):
+            for k in range(start[node], start[node] + count[node]):
+                b = order[k]
+                if inside or (min_x <= pos_x[b] <= max_x and min_y <= pos_y[b] <= max_y):
+                    found[total] = b
+                    total += 1
+            continue
+
+        for quadrant in range(4):
+            child = children[quadrant, node]
+            if child != -1:
+                stack[top] = child
+                top += 1
+    return found[:total]
+
+def _warm_up():
+    """Compile the kernels with the argument types the simulation uses, so the first frame does not stall."""
+    pos = np.array([[0.0, 1.0], [0.0, 0.0]])
+    mass = np.ones(2, dtype=PROPERTY_DTYPE)
+    tree = QuadTree(pos[0], pos[1], mass)
+    tree.compute_forces(pos[0], pos[1], mass, np.zeros(2), np.zeros(2), 1.0, 1.0, math.inf, 0.5)
+    tree.find_collisions(mass, np.ones(2, dtype=bool))
+    tree.query(0.0, 0.0, 1.0, 1.0)
+
+_warm_up()
@@ -1,6 +1,6 @@
 import math
-import pygame
-from typing import Tuple, List
+import numpy as np
+from typing import Tuple
 
 # Color definitions
 COLORS = {
@@ -14,29 +14,25 @@ COLORS = {
     'text': (255, 255, 255),    # White
 }
 
-def calculate_distance(pos1: Tuple[float, float], pos2: Tuple[float, float]) -> float:
-    """Calculate the distance between two positions."""
-    dx = pos1[0] - pos2[0]
-    dy = pos1[1] - pos2[1]
-    return math.sqrt(dx**2 + dy**2)
-
 def world_to_screen(world_pos: Tuple[float, float], camera_pos: Tuple[float, float], zoom: float, screen_size: Tuple[int, int]) -> Tuple[int, int]:
     """Convert world coordinates to screen coordinates."""
     screen_x = (world_pos[0] - camera_pos[0]) * zoom + screen_size[0] // 2
     screen_y = (world_pos[1] - camera_pos[1]) * zoom + screen_size[1] // 2
     return (int(screen_x), int(screen_y))
 
+def world_to_screen_batch(world_positions: np.ndarray, camera_pos: Tuple[float, float], zoom: float, screen_size: Tuple[int, int]) -> np.ndarray:
+    """Convert an (N, 2) array of world coordinates to an (N, 2) integer array of screen coordinates."""
+    offset = (screen_size[0] // 2, screen_size[1] // 2)
+    world_positions = np.asarray(world_positions, dtype=float).reshape(-1, 2)
+    return ((world_positions - camera_pos) * zoom + offset).astype(int)
+
 def screen_to_world(screen_pos: Tuple[int, int], camera_pos: Tuple[float, float], zoom: float, screen_size: Tuple[int, int]) -> Tuple[float, float]:
     """Convert screen coordinates to world coordinates."""
     world_x = (screen_pos[0] - screen_size[0] // 2) / zoom + camera_pos[0]
     world_y = (screen_pos[1] - screen_size[1] // 2) / zoom + camera_pos[1]
     return (world_x, world_y)
 
-def draw_text(surface: pygame.Surface, text: str, font: pygame.font.Font, color: Tuple[int, int, int], pos: Tuple[int, int]):
-    """Draw text on the surface."""
-    text_surface = font.render(text, True, color)
-    surface.blit(text_surface, pos)
-
-def clamp(value: float, min_val: float, max_val: float) -> float:
-    """Clamp a value between min and max."""
-    return max(min_val, min(value, max_val)) 
\ No newline at end of file
+def quantize_radii(radii: np.ndarray, step: float = 1.25) -> np.ndarray:
+    """Round an array of radii to the nearest powers of step, so caches keyed on them stay small."""
+    exponents = np.rint(np.log(np.maximum(radii, 1)) / math.log(step))
+    return np.maximum(1, np.rint(step ** exponents)).astype(int)
@@ -1,9 +1,58 @@
-import random
+import os
 import math
+import numpy as np
 from typing import Tuple
 from objects import Star, Planet, Asteroid, Nebula, BlackHole
 from physics import PhysicsEngine
-from utils import calculate_distance
+from bodies import Bodies
+from physics_kernels import nearest_body
+
+def _random_seed() -> int:
+    """Get a random 64-bit seed from the operating system."""
+    return int.from_bytes(os.urandom(8), 'little')
+
+def _star_info(star: Star) -> dict:
+    """Get the formatted information specific to a star."""
+    return {
+        'luminosity': f"{star.luminosity:.2f} solar luminosities",
+        'temperature': f"{star.temperature:.0f} K",
+        'age': f"{star.age:.2e} years"
+    }
+
+def _planet_info(planet: Planet) -> dict:
+    """Get the formatted information specific to a planet."""
+    return {
+        'atmosphere': planet.atmosphere,
+        'water': planet.water,
+        'temperature': f"{planet.temperature:.0f} K"
+    }
+
+def _asteroid_info(asteroid: Asteroid) -> dict:
+    """Get the formatted information specific to an asteroid."""
+    return {
+        'composition': asteroid.composition
+    }
+
+def _nebula_info(nebula: Nebula) -> dict:
+    """Get the formatted information specific to a nebula."""
+    return {
+        'density': f"{nebula.density:.2f}"
+    }
+
+def _black_hole_info(black_hole: BlackHole) -> dict:
+    """Get the formatted information specific to a black hole."""
+    return {
+        'event_horizon_radius': black_hole.event_horizon_radius
+    }
+
+# Type-specific info for each kind of object, keyed by its exact class
+_INFO_EXTRACTORS = {
+    Star: _star_info,
+    Planet: _planet_info,
+    Asteroid: _asteroid_info,
+    Nebula: _nebula_info,
+    BlackHole: _black_hole_info,
+}
 
 class Universe:
     """Represents the entire universe with all celestial objects."""
@@ -14,30 +63,56 @@ class Universe:
 
     MIN_NUMBER_OF_BODIES = 200
     MAX_NUMBER_OF_BODIES = 600
+
+    # Removed objects are left in the physics arrays until fewer than this
+    # fraction of the entries are still alive
+    COMPACTION_THRESHOLD = 0.75
+
+    # Steps between reorderings of the physics arrays along the spatial
+    # index's Morton curve, which keeps nearby objects adjacent in memory
+    MORTON_SORT_INTERVAL = 32
     
     def __init__(self):
         self.objects: dict = {}
         self.physics_engine = PhysicsEngine()
         self.time = 0
-        self.generation_seed = random.randint(1, 1000000)
+        self.generation_seed = _random_seed()
+        self.rng = np.random.Generator(np.random.PCG64(self.generation_seed))
 
-        number_of_bodies = random.randint(self.MIN_NUMBER_OF_BODIES, self.MAX_NUMBER_OF_BODIES)
+        number_of_bodies = int(self.rng.integers(self.MIN_NUMBER_OF_BODIES, self.MAX_NUMBER_OF_BODIES, endpoint=True))
         self.max_star_count = int(number_of_bodies * 0.3)
         self.max_planet_count = int(number_of_bodies * 0.09)
         self.max_asteroid_count = int(number_of_bodies * 0.5)
         self.max_nebula_count = int(number_of_bodies * 0.1)
         self.max_black_hole_count = 1
         self.time_step = self.TIME_STEP
+
+        # Physics state of every object, ordered like self.object_list
+        self.bodies = Bodies.empty()
+        self.object_list = []
+
+        # Objects that record a trail each step
+        self._trail_objects = []
+
+        # Formatted information that never changes, by object name
+        self._fixed_info = {}
+
+        # Quadtree over the current positions, used for view culling and by
+        # Barnes-Hut steps
+        self.spatial_index = self.physics_engine.build_spatial_index(self.bodies.pos, self.bodies.mass)
+        self._steps_since_sort = 0
         
     def generate_universe(self):
         """Procedurally generate the entire universe."""
-        random.seed(self.generation_seed)
+        # Every random draw of the generation comes from this one generator
+        self.rng = np.random.Generator(np.random.PCG64(self.generation_seed))
         self.objects.clear()
+        self._fixed_info.clear()
         
         # Generate stars
         self._generate_stars()
         
-        # Generate planets (some orbiting stars)
+        # Generate planets
         self._generate_planets()
         
         # Generate asteroids
@@ -49,136 +124,128 @@ class Universe:
         # Generate black holes
         self._generate_black_holes()
         
-        # Set up some stable orbits
-        self._setup_stable_orbits()
+        self._rebuild_object_list()
+        self.bodies = Bodies.from_objects(self.object_list)
+        self.spatial_index = self.physics_engine.build_spatial_index(self.bodies.pos, self.bodies.mass,
+                                                                     self.spatial_index)
+        self._sort_spatially()
         
         print(f"Generated universe with {len(self.objects)} objects")
     
     def _generate_stars(self):
         """Generate stars throughout the universe."""
-        for i in range(random.randint(1, self.max_star_count)):
-            name = f"Star-{i+1:03d}"
-            position = self._random_position()
-            velocity = self._random_velocity()
-            
-            star = Star(name, position, velocity)
+        count = self.rng.integers(1, self.max_star_count, endpoint=True)
+        positions = self._random_positions(count)
+        velocities = self._random_velocities(count)
+        for i in range(count):
+            star = Star(f"Star-{i+1:03d}", positions[:, i], velocities[:, i], self.rng)
             self.objects[star.name] = star
     
     def _generate_planets(self):
-        """Generate planets, some orbiting stars."""
-        for i in range(random.randint(1, self.max_planet_count)):
-            name = f"Planet-{i+1:03d}"
-            
-            # 70% chance to orbit a nearby star
-            if random.random() < 0.7 and len([obj for obj in self.objects if isinstance(obj, Star)]) > 0:
-                # Find a nearby star
-                stars = [obj for obj in self.objects if isinstance(obj, Star)]
-                parent_star = random.choice(stars)
-                
-                # Position planet near the star
-                angle = random.uniform(0, 2 * math.pi)
-                distance = random.uniform(50, 300)
-                position = (
-                    parent_star.position[0] + distance * math.cos(angle),
-                    parent_star.position[1] + distance * math.sin(angle)
-                )
-                
-                # Calculate orbital velocity
-                orbital_velocity = self.physics_engine.calculate_orbital_velocity(parent_star.mass, distance)
-                velocity = (
-                    parent_star.velocity[0] - orbital_velocity * math.sin(angle),
-                    parent_star.velocity[1] + orbital_velocity * math.cos(angle)
-                )
-                
-                planet = Planet(name, position, velocity, parent_star)
-            else:
-                # Free-floating planet
-                position = self._random_position()
-                velocity = self._random_velocity()
-                planet = Planet(name, position, velocity)
-            
+        """Generate free-floating planets."""
+        count = self.rng.integers(1, self.max_planet_count, endpoint=True)
+        positions = self._random_positions(count)
+        velocities = self._random_velocities(count)
+        for i in range(count):
+            planet = Planet(f"Planet-{i+1:03d}", positions[:, i], velocities[:, i], self.rng)
             self.objects[planet.name] = planet
     
     def _generate_asteroids(self):
         """Generate asteroids throughout the universe."""
-        for i in range(random.randint(1, self.max_asteroid_count)):
-            name = f"Asteroid-{i+1:03d}"
-            position = self._random_position()
-            velocity = self._random_velocity()
-            
-            asteroid = Asteroid(name, position, velocity)
+        count = self.rng.integers(1, self.max_asteroid_count, endpoint=True)
+        positions = self._random_positions(count)
+        velocities = self._random_velocities(count)
+        for i in range(count):
+            asteroid = Asteroid(f"Asteroid-{i+1:03d}", positions[:, i], velocities[:, i], self.rng)
             self.objects[asteroid.name] = asteroid
 
     def _generate_nebulae(self):
         """Generate nebulae in the universe."""
-        for i in range(random.randint(1, self.max_nebula_count)):
-            name = f"Nebula-{i+1:02d}"
-            position = self._random_position()
-            velocity = self._random_velocity()
-            
-            nebula = Nebula(name, position, velocity)
+        count = self.rng.integers(1, self.max_nebula_count, endpoint=True)
+        positions = self._random_positions(count)
+        velocities = self._random_velocities(count)
+        for i in range(count):
+            nebula = Nebula(f"Nebula-{i+1:02d}", positions[:, i], velocities[:, i], self.rng)
             self.objects[nebula.name] = nebula
     
     def _generate_black_holes(self):
         """Generate a few black holes."""
-        black_hole_count = random.randint(0, self.max_black_hole_count)
-        for i in range(black_hole_count):
-            name = f"BlackHole-{i+1:02d}"
-            position = self._random_position()
-            velocity = (0, 0)
-            
-            black_hole = BlackHole(name, position, velocity)
+        count = self.rng.integers(0, self.max_black_hole_count, endpoint=True)
+        positions = self._random_positions(count)
+        for i in range(count):
+            black_hole = BlackHole(f"BlackHole-{i+1:02d}", positions[:, i], (0, 0), self.rng)
             self.objects[black_hole.name] = black_hole
     
-    def _setup_stable_orbits(self):
-        """Set up some stable orbits for planets around stars."""
-        planets = [obj for obj in self.objects if isinstance(obj, Planet) and obj.parent_star is not None]
-        
-        for planet in planets:
-            if planet.parent_star:
-                # Calculate distance to parent star
-                distance = calculate_distance(planet.position, planet.parent_star.position)
-                
-                # Set up stable orbit
-                self.physics_engine.create_stable_orbit(planet.parent_star, planet, distance)
-    
-    def _random_position(self) -> Tuple[float, float]:
-        """Generate a random position within the universe bounds."""
-        return (
-            random.uniform(-self.UNIVERSE_STARTING_LIMIT, self.UNIVERSE_STARTING_LIMIT),
-            random.uniform(-self.UNIVERSE_STARTING_LIMIT, self.UNIVERSE_STARTING_LIMIT)
-        )
-
-    def _random_velocity(self) -> Tuple[float, float]:
-        """Generate a random velocity vector."""
-        speed = random.uniform(0, 100)
-        angle = random.uniform(0, 2 * math.pi)
-        return (
-            speed * math.cos(angle),
-            speed * math.sin(angle)
-        )
+    def _random_positions(self, count: int) -> np.ndarray:
+        """Generate a (2, count) array of random positions within the universe bounds."""
+        return self.rng.uniform(-self.UNIVERSE_STARTING_LIMIT, self.UNIVERSE_STARTING_LIMIT, (2, count))
+
+    def _random_velocities(self, count: int) -> np.ndarray:
+        """Generate a (2, count) array of random velocity vectors."""
+        speed = self.rng.uniform(0, 100, count)
+        angle = self.rng.uniform(0, 2 * math.pi, count)
+        return speed * np.array([np.cos(angle), np.sin(angle)])
     
+    def _rebuild_object_list(self):
+        """Rebuild the cached lists of objects after objects are added."""
+        self.object_list = list(self.objects.values())
+        self._trail_objects = [obj for obj in self.object_list if obj.SHOW_TRAIL]
+
+    def _reorder_bodies(self, keep: np.ndarray):
+        """Keep the bodies and objects picked by a boolean mask or an index array, in that order."""
+        self.bodies = self.bodies.select(keep)
+        indices = np.flatnonzero(keep) if keep.dtype == bool else keep
+        self.object_list = [self.object_list[i] for i in indices.tolist()]
+        self._trail_objects = [obj for obj, alive in zip(self.object_list, self.bodies.alive.tolist())
+                               if alive and obj.SHOW_TRAIL]
+        self.bodies.bind(self.object_list)
+
+    def _sort_spatially(self):
+        """Reorder the bodies along the spatial index's Morton curve and rebuild the index."""
+        self._reorder_bodies(self.spatial_index.order)
+        self.spatial_index = self.physics_engine.build_spatial_index(self.bodies.pos, self.bodies.mass,
+                                                                     self.spatial_index)
+        self._steps_since_sort = 0
+
+    def integrate(self, dt) -> np.ndarray:
+        """Advance all objects by one time step and return the index pairs of colliding objects."""
+        bodies = self.bodies
+        collision_pairs = self.physics_engine.step(bodies.pos, bodies.vel, bodies.force, bodies.mass,
+                                                   bodies.inv_mass, bodies.size, dt, self.spatial_index,
+                                                   bodies.moved)
+
+        # Objects see the new state through their views of the arrays
+        for obj in self._trail_objects:
+            obj.record_trail()
+        return collision_pairs
+
     def update(self):
         """Update the universe for one time step."""
-        # Calculate gravitational forces
-        self.physics_engine.calculate_gravitational_forces(self.objects.values())
-        
-        # Update object positions and velocities
-        self.physics_engine.update_objects(self.objects.values(), self.time_step)
+        # Calculate gravitational forces and update object positions and velocities
+        collision_pairs = self.integrate(self.time_step)
         
-        # Check for collisions
-        collisions = self.physics_engine.check_collisions(self.objects.values())
-        
-        # Handle collisions by removing the smaller object
-        objects_to_remove = []
-        for obj1, obj2 in collisions:
-            obj_to_remove = self.physics_engine.handle_collision(obj1, obj2)
-            if obj_to_remove:
-                objects_to_remove.append(obj_to_remove)
-
-        for obj in objects_to_remove:
-            if self.objects.get(obj.name):
-                self.objects.pop(obj.name)
+        # Handle collisions found during the step by removing the smaller object
+        objects = self.object_list
+        removed = []
+        for i, j in collision_pairs.tolist():
+            obj_to_remove = self.physics_engine.handle_collision(objects[i], objects[j])
+            if obj_to_remove and self.objects.pop(obj_to_remove.name, None) is not None:
+                removed.append(j if obj_to_remove is objects[j] else i)
+                self._fixed_info.pop(obj_to_remove.name, None)
+
+        if removed:
+            self.bodies.remove(removed)
+            self._trail_objects = [obj for obj in self._trail_objects if obj.name in self.objects]
+
+            if len(self.objects) < self.COMPACTION_THRESHOLD * len(self.bodies):
+                # Compact the arrays, keeping the remaining objects in order
+                self._reorder_bodies(self.bodies.alive)
+
+        self.spatial_index = self.physics_engine.build_spatial_index(self.bodies.pos, self.bodies.mass,
+                                                                     self.spatial_index)
+        self._steps_since_sort += 1
+        if self._steps_since_sort >= self.MORTON_SORT_INTERVAL:
+            self._sort_spatially()
                
         self.time += self.time_step
 
@@ -188,76 +255,92 @@ class Universe:
     def decrease_time_step(self):
         self.time_step -= self.TIME_STEP_INCREMENT
     
+    def get_positions(self) -> np.ndarray:
+        """Get a (2, N) array of object positions, ordered like self.object_list."""
+        return self.bodies.pos
+
+    def get_sizes(self) -> np.ndarray:
+        """Get an array of object sizes, ordered like self.object_list."""
+        return self.bodies.size
+
+    def get_min_radii(self) -> np.ndarray:
+        """Get an array of the smallest on-screen radius of each object, ordered like self.object_list."""
+        return self.bodies.min_radius
+
+    def get_alive(self) -> np.ndarray:
+        """Get an array marking which entries of self.object_list have not been removed."""
+        return self.bodies.alive
+
     def get_nearest_object(self, position: Tuple[float, float]) -> Tuple:
         """Get the nearest object to a position."""
-        from utils import calculate_distance
-        
-        nearest_obj = None
-        min_distance = float('inf')
-        
-        for obj in self.objects.values():
-            distance = calculate_distance(position, obj.position)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_obj = obj
-        
-        return nearest_obj, min_distance
+        if len(self.objects) == 0:
+            return None, float('inf')
+
+        if len(self.objects) == len(self.bodies):
+            nearest, distance_sq = nearest_body(self.bodies.pos_x, self.bodies.pos_y, position[0], position[1])
+        else:
+            # Only search the objects that have not been removed
+            alive = np.flatnonzero(self.bodies.alive)
+            nearest, distance_sq = nearest_body(self.bodies.pos_x[alive], self.bodies.pos_y[alive],
+                                                position[0], position[1])
+            nearest = alive[nearest]
+        return self.object_list[nearest], math.sqrt(distance_sq)
     
     def get_object_info(self, obj) -> dict:
         """Get detailed information about an object."""
-        info = {
+        fixed_info = self._fixed_info.get(obj.name)
+        if fixed_info is None:
+            fixed_info = self._fixed_info[obj.name] = self._format_fixed_info(obj)
+        summary, details = fixed_info
+
+        x, y = obj.position.tolist()
+        vx, vy = obj.velocity.tolist()
+        info = dict(summary)
+        info.update({
+            'position': f"({x:.1f}, {y:.1f})",
+            'velocity': f"({vx:.1f}, {vy:.1f})",
+            'speed': f"{math.hypot(vx, vy):.1f} m/s"
+        })
+        info.update(details)
+        return info
+
+    def _format_fixed_info(self, obj) -> Tuple[dict, dict]:
+        """Format the information about an object that does not change as it moves.
+
+        Returns the fields shown before its motion and the type-specific
+        fields shown after it.
+        """
+        summary = {
             'name': obj.name,
             'type': type(obj).__name__,
-            'mass': f"{obj.mass:.2e} kg",
-            'position': f"({obj.position[0]:.1f}, {obj.position[1]:.1f})",
-            'velocity': f"({obj.velocity[0]:.1f}, {obj.velocity[1]:.1f})",
-            'speed': f"{math.sqrt(obj.velocity[0]**2 + obj.velocity[1]**2):.1f} m/s"
+            'mass': f"{obj.mass:.2e} kg"
         }
-        
-        if isinstance(obj, Star):
-            info.update({
-                'luminosity': f"{obj.luminosity:.2f} solar luminosities",
-                'temperature': f"{obj.temperature:.0f} K",
-                'age': f"{obj.age:.2e} years"
-            })
-        elif isinstance(obj, Planet):
-            info.update({
-                'atmosphere': obj.atmosphere,
-                'water': obj.water,
-                'temperature': f"{obj.temperature:.0f} K"
-            })
-        elif isinstance(obj, Asteroid):
-            info.update({
-                'composition': obj.composition
-            })
-        elif isinstance(obj, Nebula):
-            info.update({
-                'density': f"{obj.density:.2f}"
-            })
-        elif isinstance(obj, BlackHole):
-            info.update({
-                'event_horizon_radius': obj.event_horizon_radius
-            })
-        
-        return info
+        extract = _INFO_EXTRACTORS.get(type(obj))
+        details = extract(obj) if extract else {}
+
+        return summary, details
     
     def reset(self):
         """Reset the universe with new generation."""
-        self.generation_seed = random.randint(1, 1000000)
+        self.generation_seed = _random_seed()
         self.time = 0
         self.generate_universe()
     
     def get_statistics(self) -> dict:
         """Get universe statistics."""
         stats = {
-            'total_objects': len(self.objects.values()),
-            'stars': len([obj for obj in self.objects.values() if isinstance(obj, Star)]),
-            'planets': len([obj for obj in self.objects.values() if isinstance(obj, Planet)]),
-            'asteroids': len([obj for obj in self.objects.values() if isinstance(obj, Asteroid)]),
-            'nebulae': len([obj for obj in self.objects.values() if isinstance(obj, Nebula)]),
-            'black_holes': len([obj for obj in self.objects.values() if isinstance(obj, BlackHole)]),
+            'total_objects': len(self.objects),
+            'stars': self._count_alive(Star.TYPE_ID),
+            'planets': self._count_alive(Planet.TYPE_ID),
+            'asteroids': self._count_alive(Asteroid.TYPE_ID),
+            'nebulae': self._count_alive(Nebula.TYPE_ID),
+            'black_holes': self._count_alive(BlackHole.TYPE_ID),
             'time': f"{self.time} years",
             'time_step': f"{self.time_step} years"
         }
         
-        return stats 
\ No newline at end of file
+        return stats
+
+    def _count_alive(self, type_id: int) -> int:
+        """Count the objects of a type that have not been removed."""
+        return int(np.count_nonzero(self.bodies.alive[self.bodies.get_indices(type_id)]))